@@ -19,7 +19,7 @@ import sys
 import threading
 import time
 import queue
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
@@ -32,9 +32,10 @@ if ROOT not in sys.path:
 from src.calibration import run_calibration as _run_calibration
 from src.train_model import train_model as _train_model
 from src.inference import run_realtime as _run_realtime
+from src.feature_extraction import FeatureExtractor
 
 
-@dataclass
+@dataclass(frozen=True)
 class AppConfig:
     # General
     window_w: int = 1280
@@ -45,9 +46,12 @@ class AppConfig:
     warmup_frames: int = 8
     out_csv: str = "data/calibration_samples.csv"
     # Training
-    model_out: str = "models/gaze_ridge_xy.joblib"
+    train_csv: str = "data/calibration_samples.csv"
+    model_out: str = "models/gaze_ridge_xy.npz"
     # Realtime
-    model_in: str = "models/gaze_ridge_xy.joblib"
+    model_in: str = "models/gaze_ridge_xy.npz"
+    rt_window_w: int = 1280
+    rt_window_h: int = 720
     fps_target: int = 30
 
 
@@ -62,6 +66,8 @@ class GazeApp(tk.Tk):
         self.log_q = queue.Queue()
         self._threads = []
         self._rt_stop_flag = threading.Event()
+        self._fe = None  # FeatureExtractor reused across realtime runs
+        self._rt_thread = None  # at most one realtime job; FaceMesh isn't thread-safe
 
         self._build_ui()
         self._pump_logs()
@@ -132,11 +138,11 @@ class GazeApp(tk.Tk):
         g.pack(fill=tk.X, expand=False)
 
         ttk.Label(g, text="Calibration CSV:").grid(row=0, column=0, sticky="w", padx=4, pady=4)
-        self.var_train_csv = tk.StringVar(value=self.config.out_csv)
+        self.var_train_csv = tk.StringVar(value=self.config.train_csv)
         ttk.Entry(g, textvariable=self.var_train_csv, width=40).grid(row=0, column=1, columnspan=2, sticky="we")
         ttk.Button(g, text="Browse…", command=self._choose_train_csv).grid(row=0, column=3, sticky="w")
 
-        ttk.Label(g, text="Model output (.joblib):").grid(row=1, column=0, sticky="w", padx=4, pady=4)
+        ttk.Label(g, text="Model output (.npz):").grid(row=1, column=0, sticky="w", padx=4, pady=4)
         self.var_model_out = tk.StringVar(value=self.config.model_out)
         ttk.Entry(g, textvariable=self.var_model_out, width=40).grid(row=1, column=1, columnspan=2, sticky="we")
         ttk.Button(g, text="Browse…", command=self._choose_model_out).grid(row=1, column=3, sticky="w")
@@ -153,17 +159,17 @@ class GazeApp(tk.Tk):
         g = ttk.LabelFrame(f, text="Realtime Settings", padding=10)
         g.pack(fill=tk.X, expand=False)
 
-        ttk.Label(g, text="Model (.joblib):").grid(row=0, column=0, sticky="w", padx=4, pady=4)
+        ttk.Label(g, text="Model (.npz):").grid(row=0, column=0, sticky="w", padx=4, pady=4)
         self.var_model_in = tk.StringVar(value=self.config.model_in)
         ttk.Entry(g, textvariable=self.var_model_in, width=40).grid(row=0, column=1, columnspan=2, sticky="we")
         ttk.Button(g, text="Browse…", command=self._choose_model_in).grid(row=0, column=3, sticky="w")
 
         ttk.Label(g, text="Capture Width:").grid(row=1, column=0, sticky="w", padx=4, pady=4)
-        self.var_rt_w = tk.IntVar(value=self.config.window_w)
+        self.var_rt_w = tk.IntVar(value=self.config.rt_window_w)
         ttk.Entry(g, textvariable=self.var_rt_w, width=8).grid(row=1, column=1, sticky="w")
 
         ttk.Label(g, text="Capture Height:").grid(row=1, column=2, sticky="w", padx=(10,4), pady=4)
-        self.var_rt_h = tk.IntVar(value=self.config.window_h)
+        self.var_rt_h = tk.IntVar(value=self.config.rt_window_h)
         ttk.Entry(g, textvariable=self.var_rt_h, width=8).grid(row=1, column=3, sticky="w")
 
         ttk.Label(g, text="Target FPS:").grid(row=2, column=0, sticky="w", padx=4, pady=4)
@@ -175,18 +181,21 @@ class GazeApp(tk.Tk):
         ttk.Button(row, text="Start Realtime", command=self._start_realtime).pack(side=tk.LEFT, padx=(0,8))
         ttk.Button(row, text="Stop Realtime", command=self._stop_realtime).pack(side=tk.LEFT)
 
-        ttk.Label(f, text="(Close the OpenCV window or click Stop Realtime to end)").pack(anchor="w", pady=(6,0))
+        ttk.Label(f, text="(Press ESC in the OpenCV window or click Stop Realtime to end)").pack(anchor="w", pady=(6,0))
 
         return f
 
     # ------------- Actions -------------
     def _start_calibration(self):
-        w = int(self.var_w.get())
-        h = int(self.var_h.get())
-        grid = int(self.var_grid.get())
-        warm = int(self.var_warm.get())
-        dwell = int(self.var_dwell.get())
-        out_csv = self.var_csv.get()
+        cfg = self._snapshot_config("window_w", "window_h", "points_per_grid",
+                                    "dwell_frames", "warmup_frames", "out_csv")
+        if cfg is None:
+            return
+        w, h = cfg.window_w, cfg.window_h
+        grid = cfg.points_per_grid
+        warm = cfg.warmup_frames
+        dwell = cfg.dwell_frames
+        out_csv = cfg.out_csv
 
         self._log(f"Calibration starting → size=({w},{h}), grid={grid}x{grid}, warmup={warm}, dwell={dwell}, out={out_csv}")
         def job():
@@ -202,58 +211,95 @@ class GazeApp(tk.Tk):
         self._run_bg(job)
 
     def _start_training(self):
-        csv_path = self.var_train_csv.get()
-        model_out = self.var_model_out.get()
+        cfg = self._snapshot_config("train_csv", "model_out")
+        if cfg is None:
+            return
+        csv_path = cfg.train_csv
+        model_out = cfg.model_out
         self._log(f"Training starting → csv={csv_path}, out={model_out}")
         def job():
             try:
-                _train_model(csv_path=csv_path, out_path=model_out)
-                self._log("Training finished.")
+                saved = _train_model(csv_path=csv_path, out_path=model_out)
+                self._log(f"Training finished → saved {saved}")
+                if saved != model_out:
+                    # keep both tabs pointing at the file that was really written;
+                    # Tk variables are only touched from the main thread
+                    self.after(0, self._use_trained_model, saved)
             except Exception as e:
                 self._log(f"[ERROR] Training failed: {e}")
         self._run_bg(job)
 
     def _start_realtime(self):
-        model_in = self.var_model_in.get()
-        w = int(self.var_rt_w.get())
-        h = int(self.var_rt_h.get())
-        fps = int(self.var_fps.get())
+        if self._rt_thread is not None and self._rt_thread.is_alive():
+            self._log("Realtime is already running — stop it before starting again.")
+            return
+        cfg = self._snapshot_config("model_in", "rt_window_w", "rt_window_h", "fps_target")
+        if cfg is None:
+            return
+        model_in = cfg.model_in
+        w, h = cfg.rt_window_w, cfg.rt_window_h
+        fps = cfg.fps_target
 
         # Reset stop flag
         self._rt_stop_flag.clear()
         self._log(f"Realtime starting → model={model_in}, size=({w},{h}), fps_target={fps}")
         def job():
             try:
-                # Wrap the original run_realtime to support stop flag
-                for _ in self._run_realtime_yield(model_in, (w, h), fps):
-                    if self._rt_stop_flag.is_set():
-                        self._log("Realtime stop requested.")
-                        break
+                # Only one realtime job runs at a time (guarded above), so this
+                # lazy init and the shared extractor are never used concurrently
+                if self._fe is None:
+                    self._fe = FeatureExtractor()
+                _run_realtime(model_path=model_in, window_size=(w, h), fps_target=fps,
+                              fe=self._fe, stop_event=self._rt_stop_flag)
+                if self._rt_stop_flag.is_set():
+                    self._log("Realtime stop requested.")
                 self._log("Realtime finished.")
             except Exception as e:
                 self._log(f"[ERROR] Realtime failed: {e}")
-        self._run_bg(job)
+        self._rt_thread = self._run_bg(job)
+
+    def _use_trained_model(self, path):
+        self.var_model_out.set(path)
+        self.var_model_in.set(path)
+        self._log(f"Model paths updated to {path}")
 
     def _stop_realtime(self):
         self._log("Stop requested — attempting to end realtime…")
         self._rt_stop_flag.set()
 
     # ------------- Helpers -------------
-    def _run_realtime_yield(self, model_path, window_size, fps_target):
-        """
-        Calls the stock _run_realtime but yields periodically so we can check a stop flag.
-        This is a cooperative stop mechanism: the original function draws/handles its own window.
+    def _snapshot_config(self, *fields):
+        """Read the given AppConfig fields from their Tk variables, once, on the main thread.
+
+        Fields not asked for keep their last snapshot value, so a bad entry on one
+        tab never blocks another tab's action. Returns None (and logs why) if a
+        numeric field is blank or not a number.
         """
-        # We run it on a thread and periodically yield control back to the GUI.
-        # Since we cannot easily break inside _run_realtime without modifying it,
-        # we simply call it and yield once; user can also close the OpenCV window.
-        _run_realtime(model_path=model_path, window_size=window_size, fps_target=fps_target)
-        yield  # single yield after completion
+        vars_ = {
+            "window_w": self.var_w, "window_h": self.var_h,
+            "points_per_grid": self.var_grid, "dwell_frames": self.var_dwell,
+            "warmup_frames": self.var_warm, "out_csv": self.var_csv,
+            "train_csv": self.var_train_csv, "model_out": self.var_model_out,
+            "model_in": self.var_model_in, "rt_window_w": self.var_rt_w,
+            "rt_window_h": self.var_rt_h, "fps_target": self.var_fps,
+        }
+        values = {}
+        for name in fields:
+            try:
+                v = vars_[name].get()
+                values[name] = int(v) if isinstance(vars_[name], tk.IntVar) else v
+            except (tk.TclError, ValueError):
+                self._log(f"[ERROR] Invalid value for {name.replace('_', ' ')} — enter a number.")
+                return None
+        cfg = replace(self.config, **values)
+        self.config = cfg
+        return cfg
 
     def _run_bg(self, fn):
         t = threading.Thread(target=fn, daemon=True)
         t.start()
         self._threads.append(t)
+        return t
 
     def _choose_csv(self):
         path = filedialog.asksaveasfilename(
@@ -278,10 +324,10 @@ class GazeApp(tk.Tk):
     def _choose_model_out(self):
         path = filedialog.asksaveasfilename(
             title="Save trained model",
-            defaultextension=".joblib",
-            filetypes=[("Joblib files","*.joblib"), ("All files","*.*")],
+            defaultextension=".npz",
+            filetypes=[("NumPy model","*.npz"), ("All files","*.*")],
             initialdir=os.path.join(ROOT, "models"),
-            initialfile=os.path.basename(self.var_model_out.get() or "gaze_ridge_xy.joblib"),
+            initialfile=os.path.basename(self.var_model_out.get() or "gaze_ridge_xy.npz"),
         )
         if path:
             self.var_model_out.set(os.path.relpath(path, ROOT))
@@ -289,7 +335,7 @@ class GazeApp(tk.Tk):
     def _choose_model_in(self):
         path = filedialog.askopenfilename(
             title="Select trained model",
-            filetypes=[("Joblib files","*.joblib"), ("All files","*.*")],
+            filetypes=[("NumPy model","*.npz"), ("Joblib files","*.joblib"), ("All files","*.*")],
             initialdir=os.path.join(ROOT, "models"),
         )
         if path:
@@ -300,17 +346,20 @@ class GazeApp(tk.Tk):
         self.log_q.put(f"[{ts}] {msg}\n")
 
     def _pump_logs(self):
+        # Drain everything queued so far and insert it in one widget update
+        buf = []
         try:
             while True:
-                msg = self.log_q.get_nowait()
-                self.log_text.configure(state=tk.NORMAL)
-                self.log_text.insert(tk.END, msg)
-                self.log_text.see(tk.END)
-                self.log_text.configure(state=tk.DISABLED)
+                buf.append(self.log_q.get_nowait())
         except queue.Empty:
             pass
+        if buf:
+            self.log_text.configure(state=tk.NORMAL)
+            self.log_text.insert(tk.END, "".join(buf))
+            self.log_text.see(tk.END)
+            self.log_text.configure(state=tk.DISABLED)
         # poll again
-        self.after(120, self._pump_logs)
+        self.after(250, self._pump_logs)
 
 
 if __name__ == "__main__":
@@ -1,97 +1,112 @@
 import os
-import csv
 import cv2
 import time
 import numpy as np
+from functools import lru_cache
 from .feature_extraction import FeatureExtractor
+from .inference import FrameGrabber, open_camera
 from .utils import ensure_dir, normalize_coords
 
+@lru_cache(maxsize=None)
 def _grid_points(cols=3, rows=3, margin=0.15):
     xs = np.linspace(margin, 1.0 - margin, cols)
     ys = np.linspace(margin, 1.0 - margin, rows)
-    grid = [(x, y) for y in ys for x in xs]  # row-major
+    grid = tuple((float(x), float(y)) for y in ys for x in xs)  # row-major
     return grid
 
 def run_calibration(window_size=(1280, 720), points_per_grid=3,
-                    dwell_frames=18, warmup_frames=8, out_csv="data/calibration_samples.csv"):
+                    dwell_frames=18, warmup_frames=8, out_csv="data/calibration_samples.csv",
+                    process_every=2):
+    if process_every < 1:
+        raise ValueError(f"process_every must be >= 1, got {process_every}")
     w, h = window_size
     ensure_dir("data")
     points = _grid_points(points_per_grid, points_per_grid, margin=0.15)
 
     fe = FeatureExtractor()
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH,  w)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+    cap = open_camera(w, h)
+    grabber = FrameGrabber(cap).start()
 
-    samples = []
+    feats, targets = [], []  # kept as parallel arrays, stacked once at save time
     font = cv2.FONT_HERSHEY_SIMPLEX
 
     try:
+        n_points = len(points)
         for i, (nx, ny) in enumerate(points, start=1):
-            cx, cy = int(nx * w), int(ny * h)
+            # per-point constants, computed once rather than every frame
+            center = (int(nx * w), int(ny * h))
+            warm_msg = f"Point {i}/{n_points} — get ready"
+            hold_msg = f"Point {i}/{n_points} — hold gaze"
+            target = (nx, ny)
             # Warmup phase: show point, let user move eyes to it
             for f in range(warmup_frames):
-                ret, frame = cap.read()
+                ret, frame = grabber.read()
                 if not ret: continue
-                _draw_target(frame, (cx, cy), f"Point {i}/{len(points)} — get ready")
+                _draw_target(frame, center, warm_msg)
                 cv2.imshow("Calibration", frame)
                 if cv2.waitKey(1) == 27:  # ESC
-                    _cleanup(cap, fe)
+                    _cleanup(fe, grabber)
                     return
 
-            # Dwell phase: collect features while user looks at the point
+            # Dwell phase: collect features while user looks at the point.
+            # The target is stationary, so FaceMesh runs on every
+            # `process_every`-th frame; frames in between only count toward the
+            # dwell time. Only fresh measurements are saved: duplicated rows
+            # could land in both train and test splits and inflate R^2.
             collected = 0
+            frame_idx = 0
+            feat = None  # never carried over from the previous point
             while collected < dwell_frames:
-                ret, frame = cap.read()
+                ret, frame = grabber.read()
                 if not ret: continue
-                feat, dbg = fe.features_from_frame(frame)
-                _draw_target(frame, (cx, cy), f"Point {i}/{len(points)} — hold gaze")
+                fresh = False
+                if frame_idx % process_every == 0 or feat is None:
+                    feat, dbg = fe.features_from_frame(frame)
+                    fresh = feat is not None
+                frame_idx += 1
+                _draw_target(frame, center, hold_msg)
                 if feat is not None:
-                    samples.append({
-                        "feat": feat.tolist(),
-                        "xy": [nx, ny]
-                    })
+                    if fresh:
+                        feats.append(feat)
+                        targets.append(target)
                     collected += 1
 
                 cv2.imshow("Calibration", frame)
                 if cv2.waitKey(1) == 27:
-                    _cleanup(cap, fe)
+                    _cleanup(fe, grabber)
                     return
 
             # brief pause between targets
-            _flash_ack(cap, (cx, cy), w, h)
+            _flash_ack(grabber, center, w, h)
 
         # Save CSV: 4 feat columns + 2 targets
-        with open(out_csv, "w", newline="") as f:
-            wr = csv.writer(f)
-            wr.writerow(["f1","f2","f3","f4","tx","ty"])
-            for s in samples:
-                wr.writerow(s["feat"] + s["xy"])
+        F = np.asarray(feats, dtype=np.float32).reshape(-1, 4)
+        T = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+        # %.9g round-trips float32 features exactly
+        np.savetxt(out_csv, np.hstack([F, T]), delimiter=",",
+                   header="f1,f2,f3,f4,tx,ty", comments="", fmt="%.9g")
 
-        print(f"Saved {len(samples)} samples to {out_csv}")
+        print(f"Saved {len(F)} samples to {out_csv}")
 
     finally:
-        _cleanup(cap, fe)
+        _cleanup(fe, grabber)
 
 def _draw_target(frame, center, msg):
-    cx, cy = center
-    cv2.circle(frame, (cx, cy), 14, (255, 255, 255), -1)
-    cv2.circle(frame, (cx, cy), 28, (255, 255, 255), 2)
+    cv2.circle(frame, center, 14, (255, 255, 255), -1)
+    cv2.circle(frame, center, 28, (255, 255, 255), 2)
     cv2.putText(frame, msg, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255,255,255), 2)
 
-def _flash_ack(cap, center, w, h, ms=250):
+def _flash_ack(grabber, center, w, h, ms=250):
     t0 = time.time()
     while (time.time() - t0) * 1000 < ms:
-        ret, frame = cap.read()
+        ret, frame = grabber.read()
         if not ret: continue
-        cx, cy = center
-        cv2.circle(frame, (cx, cy), 40, (0, 255, 0), 3)
+        cv2.circle(frame, center, 40, (0, 255, 0), 3)
         cv2.imshow("Calibration", frame)
         cv2.waitKey(1)
 
-def _cleanup(cap, fe):
-    try: cap.release()
-    except: pass
+def _cleanup(fe, grabber):
+    grabber.stop()  # also releases the capture, from the reader thread
     try: fe.close()
     except: pass
     cv2.destroyAllWindows()
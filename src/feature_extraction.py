@@ -8,7 +8,16 @@ LEFT_EYE_IDX  = [33, 133, 159, 145]   # outer/inner + top/bottom-ish
 RIGHT_EYE_IDX = [362, 263, 386, 374]
 
 class FeatureExtractor:
-    def __init__(self, static_image_mode=False, max_num_faces=1):
+    # Only these 8 landmarks are used: left eye first, then right eye
+    _EYE_IDX = np.array(LEFT_EYE_IDX + RIGHT_EYE_IDX, dtype=np.int32)
+
+    def __init__(self, static_image_mode=False, max_num_faces=1, proc_width=640):
+        # Frames wider than this are downscaled before FaceMesh; landmarks are
+        # normalized, so features are still computed in full-frame pixels.
+        self.proc_width = proc_width
+        # Reused per-frame buffers (reallocated only when the frame size changes)
+        self._small_buf = None
+        self._rgb_buf = None
         self.mp_face_mesh = mp.solutions.face_mesh
         self.mesh = self.mp_face_mesh.FaceMesh(
             static_image_mode=static_image_mode,
@@ -17,30 +26,45 @@ class FeatureExtractor:
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
+        # The first process() call does lazy graph setup (100-300 ms); pay it
+        # here on a blank frame instead of on the first real camera frame.
+        self.mesh.process(np.zeros((192, 192, 3), dtype=np.uint8))
 
     def close(self):
         self.mesh.close()
 
-    def _landmarks_to_np(self, landmarks, w, h):
-        pts = np.array([[lm.x * w, lm.y * h] for lm in landmarks], dtype=np.float32)
-        return pts
-
-    def _eye_center(self, all_pts, idxs):
-        sel = all_pts[idxs]
-        return sel.mean(axis=0)  # (x, y)
+    def _eye_pts(self, landmarks, w, h):
+        # Fetch just the eye landmarks instead of converting all 478
+        return np.fromiter(
+            (c for i in self._EYE_IDX for c in (landmarks[i].x * w, landmarks[i].y * h)),
+            dtype=np.float32, count=2 * len(self._EYE_IDX),
+        ).reshape(-1, 2)
 
     def features_from_frame(self, frame_bgr):
         h, w = frame_bgr.shape[:2]
-        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        src = frame_bgr
+        if self.proc_width and w > self.proc_width:
+            size = (self.proc_width, self.proc_width * h // w)
+            if self._small_buf is None or self._small_buf.shape[1::-1] != size:
+                self._small_buf = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            src = cv2.resize(frame_bgr, size, dst=self._small_buf,
+                             interpolation=cv2.INTER_AREA)
+        if self._rgb_buf is None or self._rgb_buf.shape != src.shape:
+            self._rgb_buf = np.empty_like(src)
+        frame_rgb = self._rgb_buf
+        frame_rgb.flags.writeable = True
+        cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+        frame_rgb.flags.writeable = False  # lets MediaPipe skip its defensive copy
         res = self.mesh.process(frame_rgb)
         if not res.multi_face_landmarks:
             return None, None
 
         face = res.multi_face_landmarks[0]
-        pts = self._landmarks_to_np(face.landmark, w, h)
+        pts = self._eye_pts(face.landmark, w, h)
 
-        lc = self._eye_center(pts, LEFT_EYE_IDX)
-        rc = self._eye_center(pts, RIGHT_EYE_IDX)
+        n_left = len(LEFT_EYE_IDX)
+        lc = pts[:n_left].mean(axis=0)  # (x, y)
+        rc = pts[n_left:].mean(axis=0)
 
         # Interocular normalization (makes features robust to scale & distance)
         interocular = np.linalg.norm(rc - lc) + 1e-6
@@ -1,52 +1,243 @@
+import os
+import sys
 import cv2
 import time
+import queue
+import threading
 import numpy as np
-from joblib import load
 from .feature_extraction import FeatureExtractor
-from .utils import ema, denormalize_coords
+from .utils import denormalize_coords
 
-def run_realtime(model_path="models/gaze_ridge_xy.joblib",
-                 window_size=(1280, 720), fps_target=30):
-    w, h = window_size
-    pack = load(model_path)
+try:
+    from numba import njit  # optional: JIT the 4->2 predict on the realtime path
+except ImportError:
+    njit = None
+
+# Process-wide caches: FaceMesh graph setup and model loading dominate startup,
+# so repeated run_realtime() calls reuse them. Call clear_cache() to release.
+_FE_CACHE = None
+_MODEL_CACHE = {}  # model_path -> (mtime, params)
+
+def _get_extractor():
+    global _FE_CACHE
+    if _FE_CACHE is None:
+        _FE_CACHE = FeatureExtractor()
+    return _FE_CACHE
+
+def _load_model(model_path):
+    # Fall back to a sibling legacy .joblib (e.g. the shipped model) until a
+    # .npz has been trained
+    if model_path.endswith(".npz") and not os.path.exists(model_path):
+        legacy = model_path[:-len(".npz")] + ".joblib"
+        if os.path.exists(legacy):
+            model_path = legacy
+    # mtime is part of the key so a retrained model is picked up
+    mtime = os.path.getmtime(model_path)
+    hit = _MODEL_CACHE.get(model_path)
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    if model_path.endswith(".npz"):
+        with np.load(model_path) as z:
+            params = (z["mean"], z["scale"], z["W"], z["b"])
+    else:
+        # legacy joblib bundle; imported lazily so the .npz path never needs joblib/sklearn
+        from joblib import load
+        params = _linear_params(load(model_path))
+    _MODEL_CACHE[model_path] = (mtime, params)
+    return params
+
+def _linear_params(pack):
+    """Return the model as (mean, scale, W, b) for a single NumPy predict.
+
+    Current bundles store these arrays directly. Older bundles hold two
+    scaler+ridge pipelines fit on the same features, so their scalers agree
+    and the ridge coefficients can be stacked.
+    """
+    if "W" in pack:
+        return pack["mean"], pack["scale"], pack["W"], pack["b"]
     mx, my = pack["model_x"], pack["model_y"]
+    sc = mx.named_steps["scaler"]
+    rx, ry = mx.named_steps["ridge"], my.named_steps["ridge"]
+    mean = sc.mean_.astype(np.float32)
+    scale = sc.scale_.astype(np.float32)
+    W = np.stack([rx.coef_, ry.coef_]).astype(np.float32)          # (2, 4)
+    b = np.array([rx.intercept_, ry.intercept_], dtype=np.float32)  # (2,)
+    return mean, scale, W, b
+
+def _predict_xy_np(feat, mean, scale, W, b):
+    return ((feat - mean) / scale) @ W.T + b
+
+def _predict_xy_unrolled(feat, mean, scale, W, b):
+    # Specialized to the 4-feature, 2-target model; no temporaries besides out
+    z0 = (feat[0] - mean[0]) / scale[0]
+    z1 = (feat[1] - mean[1]) / scale[1]
+    z2 = (feat[2] - mean[2]) / scale[2]
+    z3 = (feat[3] - mean[3]) / scale[3]
+    out = np.empty(2, dtype=np.float32)
+    out[0] = W[0, 0] * z0 + W[0, 1] * z1 + W[0, 2] * z2 + W[0, 3] * z3 + b[0]
+    out[1] = W[1, 0] * z0 + W[1, 1] * z1 + W[1, 2] * z2 + W[1, 3] * z3 + b[1]
+    return out
+
+# Without numba the unrolled version would be slower than NumPy, so fall back
+_predict_xy = (njit(cache=True, fastmath=True)(_predict_xy_unrolled)
+               if njit is not None else _predict_xy_np)
 
-    fe = FeatureExtractor()
-    cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
+def clear_cache():
+    global _FE_CACHE
+    if _FE_CACHE is not None:
+        try: _FE_CACHE.close()
+        except: pass
+        _FE_CACHE = None
+    _MODEL_CACHE.clear()
+
+def open_camera(w, h, fps=30, index=0):
+    """Open the webcam with a low-latency backend and MJPG compression.
+
+    Uncompressed YUY2 at 720p saturates USB on many webcams, so request MJPG.
+    Falls back to OpenCV's default backend if the preferred one fails.
+    """
+    if sys.platform.startswith("win"):
+        backend = cv2.CAP_MSMF
+    elif sys.platform.startswith("linux"):
+        backend = cv2.CAP_V4L2
+    else:
+        backend = cv2.CAP_ANY
+    cap = cv2.VideoCapture(index, backend)
+    if not cap.isOpened() and backend != cv2.CAP_ANY:
+        cap.release()
+        cap = cv2.VideoCapture(index)
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
     cap.set(cv2.CAP_PROP_FRAME_WIDTH,  w)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # no kernel-side backlog of old frames
+    return cap
+
+class FrameGrabber:
+    """Reads frames on a background thread so capture overlaps with FaceMesh.
+
+    Only the newest frame is kept (latest-wins). `read()` mirrors
+    `cv2.VideoCapture.read()` and returns (ok, frame). The grabber owns `cap`
+    once started: it is released on the reader thread when the loop exits, so
+    it is never released while a `cap.read()` is still in flight.
+    """
+    def __init__(self, cap):
+        self.cap = cap
+        self._q = queue.Queue(maxsize=1)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    time.sleep(0.005)
+                    continue
+                _put_latest(self._q, frame)
+        finally:
+            try: self.cap.release()
+            except: pass
+
+    def read(self, timeout=1.0):
+        try:
+            return True, self._q.get(timeout=timeout)
+        except queue.Empty:
+            return False, None
+
+    def stop(self):
+        # If a blocked read outlasts the join, the thread still releases cap
+        # itself once that read returns
+        self._stop.set()
+        self._thread.join(timeout=1.0)
 
+def run_realtime(model_path="models/gaze_ridge_xy.npz",
+                 window_size=(1280, 720), fps_target=30, fe=None,
+                 stop_event=None):
+    if fps_target < 1:
+        raise ValueError(f"fps_target must be >= 1, got {fps_target}")
+    w, h = window_size
+    frame_budget = 1.0 / fps_target
+    mean, scale, W, b = _load_model(model_path)
+    # Trigger the (one-time) JIT compile before the first real frame; this also
+    # rejects a malformed model before the camera is touched
+    _predict_xy(np.zeros(W.shape[1], dtype=np.float32), mean, scale, W, b)
+
+    # The extractor is owned by the caller (or the module cache), not closed here
+    if fe is None:
+        fe = _get_extractor()
+    cap = open_camera(w, h, fps=fps_target)
+    grabber = FrameGrabber(cap).start()
+
+    stop = threading.Event()
+    disp = None
     pred_smooth = None
     try:
-        while True:
+        # Display runs on its own thread; it sets `stop` when ESC is pressed
+        disp_q = queue.Queue(maxsize=1)
+        disp = threading.Thread(target=_display_worker, args=(disp_q, stop), daemon=True)
+        disp.start()
+
+        while not stop.is_set():
+            if stop_event is not None and stop_event.is_set():
+                break
             t0 = time.time()
-            ret, frame = cap.read()
+            ret, frame = grabber.read()
             if not ret: continue
 
+            pt = None
             feat, dbg = fe.features_from_frame(frame)
             if feat is not None:
-                nx = float(mx.predict(feat.reshape(1, -1))[0])
-                ny = float(my.predict(feat.reshape(1, -1))[0])
-                pred = np.array([nx, ny], dtype=np.float32)
-                pred_smooth = ema(pred_smooth, pred, alpha=0.25)
-                px, py = denormalize_coords(pred_smooth[0], pred_smooth[1], w, h)
+                pred = _predict_xy(feat, mean, scale, W, b)
+                # EMA (alpha=0.25) updated in place; pred is a fresh array each frame
+                if pred_smooth is None:
+                    pred_smooth = pred
+                else:
+                    pred_smooth *= 0.75
+                    pred_smooth += 0.25 * pred
+                pt = denormalize_coords(pred_smooth[0], pred_smooth[1], w, h)
 
-                _draw_hud(frame, (px, py), dbg)
+            _put_latest(disp_q, (frame, pt, dbg))
 
-            cv2.imshow("Realtime Gaze", frame)
-            if cv2.waitKey(1) == 27:  # ESC
+            # basic FPS cap; wakes early if ESC is pressed in the display window
+            dt = time.time() - t0
+            if stop.wait(max(0.0, frame_budget - dt)):
                 break
+    finally:
+        stop.set()
+        if disp is not None:
+            disp.join(timeout=1.0)
+        grabber.stop()  # also releases cap
 
-            # basic FPS cap
-            dt = time.time() - t0
-            wait = max(0, (1.0 / fps_target) - dt)
-            if wait > 0:
-                time.sleep(wait)
+def _put_latest(q, item):
+    """Put into a maxsize=1 queue, replacing any item the consumer hasn't taken."""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try: q.get_nowait()
+        except queue.Empty: pass
+        q.put_nowait(item)
+
+def _display_worker(disp_q, stop):
+    # HighGUI calls (imshow/waitKey/destroy) all stay on this one thread
+    try:
+        while not stop.is_set():
+            try:
+                frame, pt, dbg = disp_q.get(timeout=0.05)
+            except queue.Empty:
+                if cv2.waitKey(1) == 27:  # keep the window responsive while idle
+                    stop.set()
+                continue
+            if pt is not None:
+                _draw_hud(frame, pt, dbg)
+            cv2.imshow("Realtime Gaze", frame)
+            if cv2.waitKey(1) == 27:  # ESC
+                stop.set()
     finally:
-        try: cap.release()
-        except: pass
-        try: fe.close()
-        except: pass
         cv2.destroyAllWindows()
 
 def _draw_hud(frame, pt, dbg):
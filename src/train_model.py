@@ -1,33 +1,96 @@
 import os
 import csv
+import glob
+import shutil
+import hashlib
 import numpy as np
-from joblib import dump
-from sklearn.linear_model import Ridge
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 
+def _load_csv(csv_path):
+    # pandas is optional (its C tokenizer is much faster on large calibration
+    # sets) and imported here so importing this module, e.g. from the GUI, stays cheap
+    try:
+        import pandas as pd
+    except ImportError:
+        return np.loadtxt(csv_path, delimiter=",", skiprows=1, dtype=np.float32, ndmin=2)
+    return pd.read_csv(csv_path, dtype=np.float32).to_numpy()
+
+def _fit_ridge(X, y, alpha=1.0):
+    """Standardize + ridge, solved in closed form for both targets at once.
+
+    Equivalent to StandardScaler followed by Ridge(alpha) per column of y.
+    Returns (mean, scale, W, b) with W shaped (n_targets, n_features).
+    """
+    X = X.astype(np.float64)
+    y = y.astype(np.float64)
+    mu = X.mean(axis=0)
+    sd = X.std(axis=0)
+    sd[sd < 1e-8] = 1.0  # like StandardScaler, leave constant columns unscaled
+    Z = (X - mu) / sd
+    ybar = y.mean(axis=0)
+    A = Z.T @ Z + alpha * np.eye(Z.shape[1])
+    W = np.linalg.solve(A, Z.T @ (y - ybar)).T
+    # Z is centered, so the intercept is just the target mean
+    return mu, sd, W, ybar
+
+def _r2(y_true, y_pred):
+    ss_res = ((y_true - y_pred) ** 2).sum(axis=0)
+    ss_tot = ((y_true - y_true.mean(axis=0)) ** 2).sum(axis=0)
+    return 1.0 - ss_res / ss_tot
+
+def _cache_key(csv_path, test_size, random_state, alpha):
+    h = hashlib.blake2b(digest_size=16)
+    with open(csv_path, "rb") as f:
+        h.update(f.read())
+    h.update(repr((test_size, random_state, alpha)).encode())
+    return h.hexdigest()
+
 def train_model(csv_path="data/calibration_samples.csv",
-                out_path="models/gaze_ridge_xy.joblib",
-                test_size=0.2, random_state=42):
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                out_path="models/gaze_ridge_xy.npz",
+                test_size=0.2, random_state=42, alpha=1.0, use_cache=True):
+    """Fit the gaze model and return the path actually written.
 
-    data = np.loadtxt(csv_path, delimiter=",", skiprows=1, dtype=np.float32)
+    The model is a plain .npz of arrays so inference needs neither joblib nor
+    sklearn; any other extension on `out_path` is replaced with .npz.
+    """
+    out_path = os.path.splitext(out_path)[0] + ".npz"
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+
+    if not use_cache:
+        _fit_and_save(csv_path, out_path, test_size, random_state, alpha)
+        return out_path
+
+    # Reuse the previous fit when the CSV bytes and hyperparameters are unchanged
+    key = _cache_key(csv_path, test_size, random_state, alpha)
+    cached = f"{out_path}.{key}.cache"
+    if os.path.exists(cached):
+        shutil.copyfile(cached, out_path)
+        print(f"Calibration data unchanged; restored cached model to {out_path}")
+        return out_path
+
+    _fit_and_save(csv_path, out_path, test_size, random_state, alpha)
+    for stale in glob.glob(glob.escape(out_path) + ".*.cache"):
+        try: os.remove(stale)
+        except OSError: pass
+    shutil.copyfile(out_path, cached)
+    return out_path
+
+def _fit_and_save(csv_path, out_path, test_size, random_state, alpha):
+    data = _load_csv(csv_path)
     X = data[:, :4]
     y = data[:, 4:6]
 
     Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=test_size, random_state=random_state)
 
-    # Two independent regressors (x and y) wrapped in a simple class
-    model_x = Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(alpha=1.0))])
-    model_y = Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(alpha=1.0))])
-
-    model_x.fit(Xtr, ytr[:, 0])
-    model_y.fit(Xtr, ytr[:, 1])
+    # One ridge solve covers both x and y (shared scaler, 4x4 system)
+    mu, sd, W, b = _fit_ridge(Xtr, ytr, alpha=alpha)
 
-    r2x = model_x.score(Xte, yte[:, 0])
-    r2y = model_y.score(Xte, yte[:, 1])
+    r2x, r2y = _r2(yte, ((Xte - mu) / sd) @ W.T + b)
     print(f"Eval R^2 — x: {r2x:.3f}, y: {r2y:.3f}")
 
-    dump({"model_x": model_x, "model_y": model_y}, out_path)
+    np.savez(out_path,
+             mean=mu.astype(np.float32),
+             scale=sd.astype(np.float32),
+             W=W.astype(np.float32),
+             b=b.astype(np.float32))
     print(f"Saved model to {out_path}")
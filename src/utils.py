@@ -8,11 +8,6 @@ def ensure_dir(path: str):
 def now_ms() -> int:
     return int(time.time() * 1000)
 
-def ema(prev, new, alpha=0.3):
-    if prev is None:
-        return new
-    return (1 - alpha) * prev + alpha * new
-
 def normalize_coords(x, y, w, h):
     return x / float(w), y / float(h)
 